@@ -2,13 +2,19 @@
 Job queue system for handling concurrent API requests from multiple stations
 """
 import asyncio
+import heapq
+import logging
+import time
 from datetime import datetime
-from typing import Optional, Dict, Any, Callable
+from typing import Optional, Dict, Any, Callable, List, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
 import uuid
 
 
+logger = logging.getLogger("jobqueue")
+
+
 class JobStatus(str, Enum):
     """Job status enumeration"""
     QUEUED = "queued"
@@ -18,12 +24,15 @@ class JobStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
-@dataclass
+@dataclass(slots=True)
 class Job:
     """Represents a single image editing job"""
     job_id: str
     instruction: str
     image_data: bytes
+    # Decoded PIL image attached at submission so the worker doesn't decode
+    # the same bytes a second time (typed loosely to keep PIL out of this module)
+    decoded_image: Optional[Any] = None
     model: Optional[str] = None
     seed: Optional[int] = None
     system_prompt: Optional[str] = None
@@ -34,7 +43,8 @@ class Job:
     result_path: Optional[str] = None
     result_seed: Optional[int] = None
     error: Optional[str] = None
-    position: int = 0  # Position in queue
+    position: int = 0  # Position in queue at submission time
+    seq: int = 0  # Submission sequence number; position derives from it
 
 
 class JobQueue:
@@ -61,21 +71,34 @@ class JobQueue:
         
         self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
         self.jobs: Dict[str, Job] = {}  # job_id -> Job
+        # Per-status ID sets so queue status reads are O(1) instead of
+        # scanning the whole jobs dict for each status
+        self._by_status: Dict[JobStatus, set] = {status: set() for status in JobStatus}
+        # Min-heap of (expiry_monotonic, job_id) so cleanup wakes exactly when
+        # the next job expires instead of scanning all jobs on a fixed interval
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._expiry_event = asyncio.Event()
         self.current_job: Optional[Job] = None
         self.process_callback: Optional[Callable] = None  # Callback to process jobs
         
         self._worker_task: Optional[asyncio.Task] = None
         self._cleanup_task: Optional[asyncio.Task] = None
         self._running = False
+
+        # Monotonic submission/dequeue counters; a queued job's position is
+        # simply job.seq - dequeued count, so no re-sorting on dequeue
+        self._submit_seq = 0
+        self._dequeue_seq = 0
     
     def start(self):
         """Start the queue worker and cleanup tasks"""
         if not self._running:
             self._running = True
-            # Worker task will be started when first job is submitted
-            # Cleanup task runs periodically
+            # Worker blocks on queue.get() until jobs arrive;
+            # cleanup wakes on job expiry
+            self._worker_task = asyncio.create_task(self._process_queue())
             self._cleanup_task = asyncio.create_task(self._cleanup_old_jobs())
-            print(f"[JobQueue] Started - Max size: {self.max_size}, Cleanup age: {self.cleanup_age_seconds}s")
+            logger.info("Started - Max size: %d, Cleanup age: %ds", self.max_size, self.cleanup_age_seconds)
     
     async def stop(self):
         """Stop the queue worker and cleanup tasks"""
@@ -95,7 +118,7 @@ class JobQueue:
             except asyncio.CancelledError:
                 pass
         
-        print("[JobQueue] Stopped")
+        logger.info("Stopped")
     
     async def submit_job(
         self,
@@ -103,17 +126,19 @@ class JobQueue:
         image_data: bytes,
         model: Optional[str] = None,
         seed: Optional[int] = None,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[str] = None,
+        decoded_image: Optional[Any] = None
     ) -> Job:
         """
         Submit a new job to the queue
-        
+
         Args:
             instruction: Editing instruction
             image_data: Image bytes
             model: Model to use (if None, uses currently loaded model)
             seed: Random seed
             system_prompt: Optional system prompt
+            decoded_image: Already-decoded PIL image, if the caller has one
             
         Returns:
             Job object with job_id
@@ -127,6 +152,7 @@ class JobQueue:
         
         # Create job
         job_id = str(uuid.uuid4())
+        self._submit_seq += 1
         job = Job(
             job_id=job_id,
             instruction=instruction,
@@ -134,150 +160,206 @@ class JobQueue:
             model=model,
             seed=seed,
             system_prompt=system_prompt,
+            decoded_image=decoded_image,
             status=JobStatus.QUEUED,
-            position=self.queue.qsize() + 1
+            position=self._submit_seq - self._dequeue_seq,
+            seq=self._submit_seq
         )
         
         # Add to queue and tracking
         await self.queue.put(job)
         self.jobs[job_id] = job
-        
-        # Start worker if not running
-        if not self._worker_task or self._worker_task.done():
-            self._worker_task = asyncio.create_task(self._process_queue())
-        
-        print(f"[JobQueue] Job {job_id[:8]} submitted - Queue size: {self.queue.qsize()}")
+        self._by_status[job.status].add(job_id)
+
+        logger.info("Job %s submitted - Queue size: %d", job_id[:8], self.queue.qsize())
         
         return job
     
     def get_job(self, job_id: str) -> Optional[Job]:
         """Get job by ID"""
         return self.jobs.get(job_id)
-    
+
+    def get_position(self, job: Job) -> int:
+        """Current queue position of a queued job (1 = next to process)"""
+        if job.status != JobStatus.QUEUED:
+            return 0
+        return max(job.seq - self._dequeue_seq, 1)
+
+    def _transition(self, job: Job, new_status: JobStatus):
+        """Move a job to a new status, keeping the per-status ID sets in sync"""
+        self._by_status[job.status].discard(job.job_id)
+        job.status = new_status
+        self._by_status[new_status].add(job.job_id)
+        # The upload bytes are only needed while processing; drop them as soon
+        # as the job finishes so a large upload isn't pinned in memory for the
+        # whole cleanup retention window
+        if new_status in (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED):
+            job.image_data = b""
+            job.decoded_image = None
+
     def get_queue_status(self) -> Dict[str, Any]:
         """Get current queue status"""
-        queued_jobs = [j for j in self.jobs.values() if j.status == JobStatus.QUEUED]
-        processing_jobs = [j for j in self.jobs.values() if j.status == JobStatus.PROCESSING]
-        completed_jobs = [j for j in self.jobs.values() if j.status == JobStatus.COMPLETED]
-        failed_jobs = [j for j in self.jobs.values() if j.status == JobStatus.FAILED]
-        
         return {
             "queue_size": self.queue.qsize(),
             "max_queue_size": self.max_size,
-            "queued_count": len(queued_jobs),
-            "processing_count": len(processing_jobs),
-            "completed_count": len(completed_jobs),
-            "failed_count": len(failed_jobs),
+            "queued_count": len(self._by_status[JobStatus.QUEUED]),
+            "processing_count": len(self._by_status[JobStatus.PROCESSING]),
+            "completed_count": len(self._by_status[JobStatus.COMPLETED]),
+            "failed_count": len(self._by_status[JobStatus.FAILED]),
             "current_job_id": self.current_job.job_id if self.current_job else None,
             "total_jobs": len(self.jobs)
         }
     
+    # Upper bound on jobs drained per worker wakeup. The pipeline itself
+    # processes one image at a time (the nunchaku pipeline has no batch
+    # entry point), so "batching" here means running the drained jobs
+    # back-to-back in a single wakeup, which amortizes loop scheduling
+    # and keeps same-preset runs adjacent so the model stays resident
+    # between them.
+    MAX_BATCH = 4
+
+    def _drain_batch(self, first: Job) -> List[Job]:
+        """Collect up to MAX_BATCH already-queued jobs, preserving FIFO order.
+
+        Jobs are still generated one at a time downstream; this drain is
+        the single integration point should a batched generate ever land
+        in the pipeline manager.
+        """
+        batch = [first]
+        while len(batch) < self.MAX_BATCH:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
     async def _process_queue(self):
         """Background worker that processes jobs from the queue"""
-        print("[JobQueue] Worker started")
-        
+        logger.info("Worker started")
+
         while self._running:
+            # Block until a job arrives; stop() cancels the task to break out,
+            # so there is no need for a poll timeout
             try:
-                # Get next job (wait up to 1 second)
+                first = await self.queue.get()
+            except asyncio.CancelledError:
+                break
+
+            for job in self._drain_batch(first):
+                await self._process_one(job)
+
+    async def _process_one(self, job: Job):
+        """Run a single job through the processing callback"""
+        try:
+            # Update job status
+            self._dequeue_seq += 1
+            self._transition(job, JobStatus.PROCESSING)
+            job.started_at = datetime.now()
+            self.current_job = job
+
+            logger.info("Processing job %s - %s...", job.job_id[:8], job.instruction[:50])
+
+            # The actual image generation will be called from the worker
+            # This signals that the job is ready for processing
+            # The main.py startup event will inject the processing callback
+            if self.process_callback:
                 try:
-                    job = await asyncio.wait_for(self.queue.get(), timeout=1.0)
-                except asyncio.TimeoutError:
-                    continue
-                
-                # Update job status
-                job.status = JobStatus.PROCESSING
-                job.started_at = datetime.now()
-                self.current_job = job
-                
-                # Update positions of remaining queued jobs
-                self._update_queue_positions()
-                
-                print(f"[JobQueue] Processing job {job.job_id[:8]} - {job.instruction[:50]}...")
-                
-                # The actual image generation will be called from the worker
-                # This signals that the job is ready for processing
-                # The main.py startup event will inject the processing callback
-                if self.process_callback:
-                    try:
-                        await self.process_callback(job)
-                    except Exception as e:
-                        print(f"[JobQueue] Job processing failed: {e}")
-                        self.fail_job(job.job_id, str(e))
-                else:
-                    print("[JobQueue] WARNING: No process_callback set, job will not be processed")
-                    self.fail_job(job.job_id, "No processing callback configured")
-                
-            except Exception as e:
-                print(f"[JobQueue] Worker error: {e}")
-                if job:
-                    job.status = JobStatus.FAILED
-                    job.error = str(e)
-                    job.completed_at = datetime.now()
-                    self.current_job = None
+                    await self.process_callback(job)
+                except Exception as e:
+                    logger.error("Job processing failed: %s", e)
+                    self.fail_job(job.job_id, str(e))
+            else:
+                logger.warning("No process_callback set, job will not be processed")
+                self.fail_job(job.job_id, "No processing callback configured")
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Worker error: %s", e)
+            self._transition(job, JobStatus.FAILED)
+            job.error = str(e)
+            job.completed_at = datetime.now()
+            self._schedule_cleanup(job.job_id)
+            self.current_job = None
+        finally:
+            self.queue.task_done()
     
     def complete_job(self, job_id: str, result_path: str, result_seed: int):
         """Mark job as completed"""
         job = self.jobs.get(job_id)
         if job:
-            job.status = JobStatus.COMPLETED
+            self._transition(job, JobStatus.COMPLETED)
             job.completed_at = datetime.now()
             job.result_path = result_path
             job.result_seed = result_seed
+            self._schedule_cleanup(job_id)
             
             if self.current_job and self.current_job.job_id == job_id:
                 self.current_job = None
             
-            print(f"[JobQueue] Job {job_id[:8]} completed - Path: {result_path}")
+            logger.info("Job %s completed - Path: %s", job_id[:8], result_path)
     
     def fail_job(self, job_id: str, error: str):
         """Mark job as failed"""
         job = self.jobs.get(job_id)
         if job:
-            job.status = JobStatus.FAILED
+            self._transition(job, JobStatus.FAILED)
             job.completed_at = datetime.now()
             job.error = error
+            self._schedule_cleanup(job_id)
             
             if self.current_job and self.current_job.job_id == job_id:
                 self.current_job = None
             
-            print(f"[JobQueue] Job {job_id[:8]} failed - Error: {error}")
-    
-    def _update_queue_positions(self):
-        """Update position numbers for queued jobs"""
-        queued_jobs = sorted(
-            [j for j in self.jobs.values() if j.status == JobStatus.QUEUED],
-            key=lambda x: x.created_at
-        )
-        for i, job in enumerate(queued_jobs, start=1):
-            job.position = i
+            logger.info("Job %s failed - Error: %s", job_id[:8], error)
     
+    def _schedule_cleanup(self, job_id: str):
+        """Schedule a finished job for cleanup once cleanup_age_seconds elapse"""
+        heapq.heappush(self._expiry_heap, (time.monotonic() + self.cleanup_age_seconds, job_id))
+        self._expiry_event.set()
+
     async def _cleanup_old_jobs(self):
-        """Periodically clean up old completed/failed jobs"""
+        """Clean up completed/failed jobs as they expire.
+
+        Sleeps until the next scheduled expiry (or until a new job finishes)
+        instead of scanning every job on a fixed interval.
+        """
         while self._running:
             try:
-                await asyncio.sleep(300)  # Run every 5 minutes
-                
-                now = datetime.now()
-                to_remove = []
-                
-                for job_id, job in self.jobs.items():
-                    if job.status in [JobStatus.COMPLETED, JobStatus.FAILED]:
-                        if job.completed_at:
-                            age = (now - job.completed_at).total_seconds()
-                            if age > self.cleanup_age_seconds:
-                                to_remove.append(job_id)
-                
-                for job_id in to_remove:
-                    del self.jobs[job_id]
-                    print(f"[JobQueue] Cleaned up old job {job_id[:8]}")
-                
-                if to_remove:
-                    print(f"[JobQueue] Cleanup: Removed {len(to_remove)} old jobs")
-                
+                if not self._expiry_heap:
+                    await self._expiry_event.wait()
+                    self._expiry_event.clear()
+                    continue
+
+                delay = self._expiry_heap[0][0] - time.monotonic()
+                if delay > 0:
+                    try:
+                        # A newly finished job may reset the wait; expiries are
+                        # appended in order so the heap top stays the earliest
+                        await asyncio.wait_for(self._expiry_event.wait(), timeout=delay)
+                        self._expiry_event.clear()
+                        continue
+                    except asyncio.TimeoutError:
+                        pass
+
+                removed = 0
+                now = time.monotonic()
+                while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                    _, job_id = heapq.heappop(self._expiry_heap)
+                    job = self.jobs.get(job_id)
+                    if job and job.status in [JobStatus.COMPLETED, JobStatus.FAILED]:
+                        del self.jobs[job_id]
+                        self._by_status[job.status].discard(job_id)
+                        removed += 1
+                        logger.debug("Cleaned up old job %s", job_id[:8])
+
+                if removed:
+                    logger.info("Cleanup: Removed %d old jobs", removed)
+
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                print(f"[JobQueue] Cleanup error: {e}")
+                logger.error("Cleanup error: %s", e)
 
 
 # Global job queue instance
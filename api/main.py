@@ -7,21 +7,45 @@ when printing non-ASCII text. We reconfigure stdout/stderr to UTF-8 with
 replacement to prevent request-time logs from crashing the server.
 """
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Header, Depends, Query
-from fastapi.responses import Response, JSONResponse
+from fastapi.responses import Response, JSONResponse, FileResponse, ORJSONResponse
 from PIL import Image
+import functools
+import hashlib
+import hmac
 import io
+import logging
+import logging.handlers
 import os
 import json
 import sys
+import threading
+import time
+import queue
+import types
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, Literal
 
-from models import ModelInfo, HealthResponse, JobSubmitResponse, JobStatusResponse, QueueStatusResponse
+import png_encoder
+from models import (
+    HealthResponse,
+    JobSubmitResponse,
+    JobStatusResponse,
+    QueueStatusResponse,
+    JOB_STATUS_ADAPTER,
+)
 from pipeline_manager import PipelineManager
 from job_queue import JobQueue, JobStatus
-from prompt_filter import PromptFilterConfig, DEFAULT_BLOCKED_PROMPT_TERMS, validate_prompt_fields
+from prompt_filter import (
+    PromptFilterConfig,
+    DEFAULT_BLOCKED_PROMPT_TERMS,
+    PromptTooLongError,
+    validate_prompt_fields,
+)
 import asyncio
+import concurrent.futures
 
 
 def _configure_console_utf8() -> None:
@@ -37,9 +61,41 @@ def _configure_console_utf8() -> None:
 _configure_console_utf8()
 
 
+# Logging goes through a QueueHandler so request paths only pay a cheap
+# enqueue; formatting and the stderr write happen on the listener's
+# background thread instead of blocking workers under load
+logger = logging.getLogger("qwen_api")
+
+
+def _setup_queue_logging() -> logging.handlers.QueueListener:
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(logging.Formatter("%(levelname)s: %(name)s: %(message)s"))
+
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    return listener
+
+
+_log_listener = _setup_queue_logging()
+
+
 # Configuration Constants
+VALID_MODELS = frozenset(("4-step", "8-step", "40-step"))  # Supported presets
+PREFIX_MAP = types.MappingProxyType({
+    "4-step": "qwen04",
+    "8-step": "qwen08",
+    "40-step": "qwen40"
+})  # Model key -> saved filename prefix
+SUPPORTED_MIME = frozenset(("image/jpeg", "image/png", "image/jpg"))  # Accepted upload types
 MAX_IMAGE_SIZE_MB = 10  # Maximum upload size
+MAX_IMAGE_SIZE_BYTES = MAX_IMAGE_SIZE_MB * 1024 * 1024
 MAX_IMAGE_DIMENSION = 2048  # Maximum width or height
+PIPELINE_MAX_DIM = 1024  # Longest side handed to the pipeline (it resizes internally anyway)
 MAX_INSTRUCTION_LENGTH = 500  # Maximum instruction text length
 GENERATION_TIMEOUT_SECONDS = 300  # 5 minute timeout for generation
 MODEL_LOAD_TIMEOUT_SECONDS = 180  # 3 minute timeout for model loading
@@ -56,7 +112,7 @@ def load_local_config() -> dict:
     try:
         return json.loads(config_path.read_text(encoding="utf-8"))
     except Exception as e:
-        print(f"[WARN] Failed to read {config_path.name}: {e}")
+        logger.warning("Failed to read %s: %s", config_path.name, e)
         return {}
 
 
@@ -80,11 +136,14 @@ PROMPT_FILTER_CONFIG = _build_prompt_filter_config(LOCAL_CONFIG)
 
 
 def enforce_prompt_policy(instruction: str, system_prompt: Optional[str]) -> None:
-    blocked = validate_prompt_fields(
-        instruction=instruction,
-        system_prompt=system_prompt,
-        config=PROMPT_FILTER_CONFIG,
-    )
+    try:
+        blocked = validate_prompt_fields(
+            instruction=instruction,
+            system_prompt=system_prompt,
+            config=PROMPT_FILTER_CONFIG,
+        )
+    except PromptTooLongError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if blocked:
         raise HTTPException(
             status_code=400,
@@ -95,9 +154,98 @@ def enforce_prompt_policy(instruction: str, system_prompt: Optional[str]) -> Non
             ),
         )
 
+def _prewarm_codecs() -> None:
+    """Exercise PIL's PNG/JPEG plugins and response-model validators once.
+
+    The first decode/encode after import triggers lazy plugin registration
+    and Pydantic validator compilation - ~50-150ms a user would otherwise
+    see on the first request after startup.
+    """
+    try:
+        Image.init()
+        tiny = Image.new("RGB", (1, 1))
+        for fmt in ("PNG", "JPEG"):
+            buf = io.BytesIO()
+            tiny.save(buf, format=fmt)
+            buf.seek(0)
+            Image.open(buf).load()
+        tiny.close()
+
+        HealthResponse(status="warm", model_loaded=False)
+        JobSubmitResponse(job_id="warm", position=0, message="warm")
+        QueueStatusResponse(
+            queue_size=0, max_queue_size=0, queued_count=0, processing_count=0,
+            completed_count=0, failed_count=0, total_jobs=0
+        )
+        JobStatusResponse(
+            job_id="warm", status="queued", created_at=datetime.now(), instruction="warm"
+        )
+    except Exception as e:
+        # Purely a warm-up; never block startup on it
+        logger.warning("Codec prewarm failed: %s", e)
+
+
 # Default preset to load on startup.
-# Priority: local config file -> env var -> 4-step
-DEFAULT_PRESET = str(LOCAL_CONFIG.get("default_preset") or os.getenv("QWEN_DEFAULT_PRESET") or "4-step")
+# Priority: local config file -> env vars -> 4-step
+# (PREWARM_MODEL is the orchestrator-facing alias for QWEN_DEFAULT_PRESET)
+DEFAULT_PRESET = str(
+    LOCAL_CONFIG.get("default_preset")
+    or os.getenv("QWEN_DEFAULT_PRESET")
+    or os.getenv("PREWARM_MODEL")
+    or "4-step"
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Single startup/shutdown boundary (replaces the deprecated on_event hooks).
+
+    Everything before the yield runs once before the server accepts traffic;
+    everything after runs once during shutdown, after in-flight requests drain.
+    """
+    global _encode_pool
+
+    # Eager tasks (3.12+) let coroutines that finish synchronously skip
+    # loop scheduling entirely - helps the fast paths in status polling
+    # and the already-loaded-model check in the job callback
+    if hasattr(asyncio, "eager_task_factory"):
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+
+    # Warm PIL's codec registry and each response model's validators so
+    # the first real request doesn't pay plugin-scan/compile latency
+    await asyncio.to_thread(_prewarm_codecs)
+
+    _seed_image_counters()
+    job_queue.process_callback = process_job_callback
+    job_queue.start()
+    logger.info("Job queue started with processing callback")
+
+    # Pre-start the PNG encode workers so the first save doesn't pay the
+    # process spawn cost
+    try:
+        _encode_pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=2, initializer=png_encoder.init_worker
+        )
+        logger.info("PNG encode pool started (2 workers)")
+    except Exception as e:
+        logger.warning("PNG encode pool unavailable, saving in-process: %s", e)
+
+    # Auto-load the default preset in the background so /edit is ready without a manual /load-model.
+    if DEFAULT_PRESET in VALID_MODELS:
+        asyncio.create_task(_load_model_locked(DEFAULT_PRESET))
+        logger.info("Auto-loading default preset: %s", DEFAULT_PRESET)
+    else:
+        logger.warning("Invalid QWEN_DEFAULT_PRESET '%s' - skipping auto-load", DEFAULT_PRESET)
+
+    yield
+
+    await job_queue.stop()
+    pipeline_manager.shutdown()
+    if _encode_pool is not None:
+        _encode_pool.shutdown(wait=False)
+    logger.info("Job queue stopped")
+    # Flush any queued records before the process exits
+    _log_listener.stop()
+
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -105,7 +253,11 @@ app = FastAPI(
     description="REST API for instruction-based image editing using Qwen models",
     version="1.0.0",
     docs_url="/docs",  # Swagger UI at /docs
-    redoc_url="/redoc"  # ReDoc at /redoc
+    redoc_url="/redoc",  # ReDoc at /redoc
+    # orjson serializes responses several times faster than stdlib json,
+    # which matters most for /status polled every few seconds per station
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Initialize pipeline manager
@@ -114,10 +266,142 @@ pipeline_manager = PipelineManager()
 # Initialize job queue with configuration
 job_queue = JobQueue(max_size=MAX_QUEUE_SIZE, cleanup_age_seconds=QUEUE_CLEANUP_AGE)
 
-# Output directory for API-generated images
-OUTPUT_DIR = Path("../generated-images/api")
+# Output directory for API-generated images, resolved once so per-image
+# path building and opens never re-walk the relative components (and the
+# paths reported to clients are unambiguous regardless of cwd)
+OUTPUT_DIR = Path("../generated-images/api").resolve()
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# Per-prefix image counters, seeded once at startup so save_image never has
+# to scan the output directory. Guarded by a lock since saves may run off
+# the event loop thread.
+_image_counters: dict = {}
+_image_counter_lock = threading.Lock()
+
+
+def _seed_image_counters():
+    """Scan the output directory once and seed the per-prefix counters"""
+    for path in OUTPUT_DIR.glob("*.png"):
+        parts = path.stem.split("_")
+        prefix = parts[0]
+        try:
+            number = int(parts[-1])
+        except ValueError:
+            number = 0
+        if number > _image_counters.get(prefix, 0):
+            _image_counters[prefix] = number
+
+
+def _next_image_number(prefix: str) -> int:
+    """Get the next sequential image number for a prefix (thread-safe)"""
+    with _image_counter_lock:
+        number = _image_counters.get(prefix, 0) + 1
+        _image_counters[prefix] = number
+        return number
+
+
+# Serializes all GPU-touching work so the /load-model endpoint, the queue
+# worker, and /edit can never drive model loading and generation concurrently
+pipeline_lock = asyncio.Lock()
+
+# Bounds concurrent /edit calls at GPU parallelism (1 for a single GPU).
+# Callers briefly wait for a slot instead of getting an instant 409, which
+# absorbs microbursts without each client implementing its own backoff.
+MAX_CONCURRENT_EDITS = int(os.getenv("MAX_CONCURRENT_EDITS", "1"))
+EDIT_WAIT_TIMEOUT_SECONDS = 2.0  # How long /edit waits for a slot before 409
+edit_sem = asyncio.Semaphore(MAX_CONCURRENT_EDITS)
+
+
+async def _load_model_locked(model_key: str):
+    """Load a model while holding the GPU lock"""
+    async with pipeline_lock:
+        return await pipeline_manager.load_model(model_key)
+
+
+async def _generate_locked(**kwargs):
+    """Generate an image while holding the GPU lock"""
+    async with pipeline_lock:
+        return await pipeline_manager.generate_image(**kwargs)
+
+
+def _check_upload_size(upload: UploadFile) -> None:
+    """Reject uploads over the cap without copying their bytes.
+
+    Starlette has already spooled the body (to memory or a temp file), so
+    seek/tell gives the exact size for free; upload.size short-circuits
+    when the client sent Content-Length.
+    """
+    size = upload.size
+    if size is None:
+        upload.file.seek(0, os.SEEK_END)
+        size = upload.file.tell()
+    if size > MAX_IMAGE_SIZE_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image too large ({size / (1024 * 1024):.1f}MB). Maximum {MAX_IMAGE_SIZE_MB}MB allowed."
+        )
+
+
+def _canonicalize(img: Image.Image) -> Image.Image:
+    """Downscale oversize images to the pipeline-native size (in place).
+
+    Diffusion cost grows quadratically with resolution and the pipeline
+    resizes internally anyway, so feeding it more than PIPELINE_MAX_DIM per
+    side is wasted attention FLOPs. thumbnail() only ever shrinks, preserving
+    aspect ratio; images already within bounds are untouched.
+    """
+    if max(img.size) > PIPELINE_MAX_DIM:
+        img.thumbnail((PIPELINE_MAX_DIM, PIPELINE_MAX_DIM), Image.Resampling.LANCZOS)
+    return img
+
+
+def _as_rgb(img: Image.Image) -> Image.Image:
+    """Return the image in RGB mode.
+
+    convert("RGB") copies the full pixel buffer even when the source is
+    already RGB (the common case for JPEG photos), so skip it then. When
+    a conversion does happen, the source image is closed so its decoder
+    buffer is released immediately instead of lingering until GC.
+    """
+    if img.mode == "RGB":
+        return img
+    converted = img.convert("RGB")
+    img.close()
+    return converted
+
+
+def _decode_rgb(image_data: bytes) -> Image.Image:
+    """Decode image bytes to an RGB PIL image (blocking - run off the loop)"""
+    img = Image.open(io.BytesIO(image_data))
+    # Force the lazy decode now so the source buffer isn't pinned by PIL
+    img.load()
+    return _as_rgb(img)
+
+
+def _decode_rgb_file(fileobj) -> Image.Image:
+    """Validate and decode an upload file object to RGB (blocking - run off the loop)
+
+    Image.open only parses the header, so the dimension check rejects
+    oversize images before a single pixel is decoded. draft() then lets
+    libjpeg decode large JPEGs directly at reduced scale (the pipeline
+    input is capped at PIPELINE_MAX_DIM anyway), skipping 4-16x of IDCT
+    work compared to full decode plus downscale.
+    """
+    fileobj.seek(0)
+    img = Image.open(fileobj)
+
+    width, height = img.size
+    if width > MAX_IMAGE_DIMENSION or height > MAX_IMAGE_DIMENSION:
+        img.close()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Image dimensions too large ({width}x{height}). Maximum {MAX_IMAGE_DIMENSION}x{MAX_IMAGE_DIMENSION} pixels."
+        )
+
+    img.draft("RGB", (PIPELINE_MAX_DIM, PIPELINE_MAX_DIM))
+    img.load()
+    return _as_rgb(img)
+
 
 # Job Processing Callback
 async def process_job_callback(job):
@@ -125,12 +409,16 @@ async def process_job_callback(job):
     Callback function to process a job from the queue
     Called by the job queue worker when a job is ready to process
     """
-    import io
-    from PIL import Image
-    
     try:
-        # Convert bytes to PIL Image
-        pil_image = Image.open(io.BytesIO(job.image_data)).convert("RGB")
+        # Reuse the image decoded at submission; fall back to decoding the
+        # raw bytes in a thread so the event loop keeps servicing /status
+        # and /health while we work
+        if job.decoded_image is not None:
+            pil_image = job.decoded_image
+        else:
+            pil_image = await asyncio.to_thread(_decode_rgb, job.image_data)
+        # The raw bytes aren't needed once we have the decoded image
+        job.image_data = b""
         
         # Generate the image using pipeline manager
         job_model = job.model or pipeline_manager.current_model
@@ -140,18 +428,23 @@ async def process_job_callback(job):
         # If the loaded model differs from the job's intended model, load it now.
         # This allows queued jobs to preserve their requested preset.
         if pipeline_manager.current_model != job_model:
-            await pipeline_manager.load_model(job_model)
+            await _load_model_locked(job_model)
 
-        result_image, actual_seed = await pipeline_manager.generate_image(
+        result_image, actual_seed = await _generate_locked(
             image=pil_image,
             instruction=job.instruction,
             model_key=job_model,
             seed=job.seed,
             system_prompt=job.system_prompt
         )
-        
+
+        # The input pixels aren't needed once generation is done; close now
+        # so the buffer isn't retained for the job's cleanup window
+        pil_image.close()
+        job.decoded_image = None
+
         # Save the result
-        result_path = save_image(result_image, job_model, actual_seed)
+        result_path = await save_image(result_image, job_model, actual_seed)
         
         # Mark job as completed
         job_queue.complete_job(job.job_id, result_path, actual_seed)
@@ -159,36 +452,19 @@ async def process_job_callback(job):
     except Exception as e:
         # Mark job as failed
         job_queue.fail_job(job.job_id, str(e))
-        print(f"[JobQueue] Error processing job {job.job_id[:8]}: {e}")
-
-
-# Startup and Shutdown Events
-@app.on_event("startup")
-async def startup_event():
-    """Start the job queue on application startup"""
-    job_queue.process_callback = process_job_callback
-    job_queue.start()
-    print("[OK] Job queue started with processing callback")
-
-    # Auto-load the default preset in the background so /edit is ready without a manual /load-model.
-    if DEFAULT_PRESET in pipeline_manager.list_models():
-        asyncio.create_task(pipeline_manager.load_model(DEFAULT_PRESET))
-        print(f"[INFO] Auto-loading default preset: {DEFAULT_PRESET}")
-    else:
-        print(f"[WARN] Invalid QWEN_DEFAULT_PRESET '{DEFAULT_PRESET}' - skipping auto-load")
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Stop the job queue on application shutdown"""
-    await job_queue.stop()
-    print("[OK] Job queue stopped")
+        logger.error("Error processing job %s: %s", job.job_id[:8], e)
 
 
 # API Key Configuration
 # Reads from .api_key file (use manage-key.ps1 to manage)
+@functools.lru_cache(maxsize=1)
 def load_api_key():
-    """Load API key from file or environment variable"""
+    """Load API key from file or environment variable.
+
+    Cached so the file is read at most once per process; call
+    load_api_key.cache_clear() to force a re-read if key rotation is
+    ever wired up.
+    """
     key_file = Path(__file__).parent / ".api_key"
     
     # Try to read from key file first
@@ -205,16 +481,19 @@ def load_api_key():
     return "changeme-insecure-default-key"
 
 API_KEY = load_api_key()
-print(f"API Server loaded key: {API_KEY[:20]}...{API_KEY[-8:]}")
+API_KEY_BYTES = API_KEY.encode()  # Pre-encoded for constant-time comparison
+logger.info("API Server loaded key: %s...%s", API_KEY[:20], API_KEY[-8:])
 
 # API Key Authentication
 async def verify_api_key(x_api_key: str = Header(..., description="API Key for authentication")):
     """
     Verify the API key from the X-API-Key header.
-    
+
     To use: Include header 'X-API-Key: your-key-here' in requests
     """
-    if x_api_key != API_KEY:
+    # compare_digest is constant-time, so the comparison leaks no timing
+    # information about how much of the key matched
+    if not x_api_key or not hmac.compare_digest(x_api_key.encode(), API_KEY_BYTES):
         raise HTTPException(
             status_code=401,
             detail="Invalid or missing API key"
@@ -222,64 +501,159 @@ async def verify_api_key(x_api_key: str = Header(..., description="API Key for a
     return x_api_key
 
 
-def save_image(image: Image.Image, model_key: str, seed: int) -> str:
-    """Save image with timestamp and seed for uniqueness (prevents race conditions)"""
-    import uuid
-    
-    # Map model key to prefix
-    prefix_map = {
-        "4-step": "qwen04",
-        "8-step": "qwen08",
-        "40-step": "qwen40"
-    }
-    prefix = prefix_map.get(model_key, "qwen")
-    
-    # Create unique filename with timestamp, seed, and UUID
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    unique_id = str(uuid.uuid4())[:8]
-    filename = f"{prefix}_{timestamp}_s{seed}_{unique_id}.png"
-    filepath = OUTPUT_DIR / filename
-    
-    # Save image with error handling
+def _make_filepath(model_key: str, seed: int) -> Path:
+    """Build a unique output path from prefix, epoch seconds, seed, and counter"""
+    prefix = PREFIX_MAP.get(model_key, "qwen")
+    # The counter alone guarantees uniqueness; epoch seconds keep names sortable
+    timestamp = int(time.time())
+    number = _next_image_number(prefix)
+    return OUTPUT_DIR / f"{prefix}_{timestamp}_s{seed}_{number:06d}.png"
+
+
+# Process pool for PNG encoding, started on app startup. Encoding in a
+# separate process sidesteps the GIL entirely, so concurrent requests'
+# encodes never steal cycles from request handling. None until startup
+# (or if pool creation fails), in which case saves fall back to a thread.
+_encode_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+
+def _write_png(image: Image.Image, filepath: Path) -> None:
+    """In-process PNG write (pool fallback), with a 1 MB write buffer so
+    PIL's small IDAT-chunk writes coalesce into a few large syscalls.
+    No fsync: the output dir is not a durability-critical store."""
+    with open(filepath, "wb", buffering=1 << 20) as f:
+        image.save(f, format="PNG", compress_level=1)
+
+
+async def save_image(image: Image.Image, model_key: str, seed: int) -> str:
+    """Encode and save the image off the event loop; returns the saved path.
+
+    compress_level=1 cuts zlib CPU several times over the default level 6
+    for a modest size increase - the right tradeoff for API delivery of
+    generated images.
+    """
+    filepath = _make_filepath(model_key, seed)
     try:
-        image.save(filepath, format="PNG")
+        if _encode_pool is not None:
+            # image.tobytes()/size/mode pickle cheaply; the worker process
+            # rebuilds the image and writes the PNG
+            await asyncio.get_running_loop().run_in_executor(
+                _encode_pool,
+                png_encoder.encode_and_write,
+                image.tobytes(), image.size, image.mode, str(filepath)
+            )
+        else:
+            await asyncio.to_thread(_write_png, image, filepath)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to save image: {str(e)}. Check disk space and permissions."
         )
-    
+
+    # Callers serve the result from disk, so the in-memory pixels can be
+    # released now rather than whenever GC gets around to it
+    image.close()
     return str(filepath)
 
 
+# Bounded LRU of previously generated results, keyed by the upload hash
+# plus every generation parameter. Only deterministic requests (explicit
+# seed) participate - seed=None means random by contract. Retries and
+# demo loops then cost a hash instead of a ~20s GPU generation.
+_RESULT_CACHE: OrderedDict = OrderedDict()
+_RESULT_CACHE_MAX = 64
+
+
+def _hash_upload(fileobj) -> bytes:
+    """Hash the spooled upload in chunks (blocking - run off the loop)"""
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    while chunk := fileobj.read(1 << 16):
+        digest.update(chunk)
+    return digest.digest()
+
+
+def _result_cache_get(key: bytes) -> Optional[str]:
+    path = _RESULT_CACHE.get(key)
+    if path is not None:
+        _RESULT_CACHE.move_to_end(key)
+    return path
+
+
+def _result_cache_put(key: bytes, path: str) -> None:
+    _RESULT_CACHE[key] = path
+    _RESULT_CACHE.move_to_end(key)
+    while len(_RESULT_CACHE) > _RESULT_CACHE_MAX:
+        _RESULT_CACHE.popitem(last=False)
+
+
+# Pre-serialized payloads for endpoints whose responses never change at
+# runtime, so serving them skips dict construction and json.dumps per call
+_ROOT_JSON = json.dumps({
+    "message": "Qwen Image Edit API",
+    "version": "1.0.0",
+    "docs": "/docs",
+    "redoc": "/redoc",
+    "endpoints": {
+        "edit": "POST /api/v1/edit",
+        "models": "GET /api/v1/models",
+        "health": "GET /api/v1/health"
+    }
+}).encode()
+
+_MODELS_JSON = json.dumps({
+    "models": pipeline_manager.list_models(),
+    "note": "Switching models between generations will take several minutes for model loading"
+}).encode()
+
+
 @app.get("/", tags=["General"])
 async def root():
     """Root endpoint with API information"""
-    return {
-        "message": "Qwen Image Edit API",
-        "version": "1.0.0",
-        "docs": "/docs",
-        "redoc": "/redoc",
-        "endpoints": {
-            "edit": "POST /api/v1/edit",
-            "models": "GET /api/v1/models",
-            "health": "GET /api/v1/health"
-        }
-    }
+    return Response(content=_ROOT_JSON, media_type="application/json")
+
+
+@app.get("/api/v1/ready", tags=["General"])
+async def readiness_probe():
+    """Readiness probe: 200 only once a model is loaded and idle.
+
+    Lets orchestrators hold traffic during the startup prewarm (see
+    PREWARM_MODEL / QWEN_DEFAULT_PRESET) instead of sending requests
+    that would 400/409 until the load finishes.
+    """
+    ready = pipeline_manager.pipeline is not None and not pipeline_manager.is_loading
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "model": pipeline_manager.current_model}
+    )
+
+
+# /health responses only change when pipeline state does; cache the encoded
+# bytes keyed on the manager's state version so steady-state probes are a
+# version compare plus a memcpy
+_health_cache_version: Optional[int] = None
+_health_cache_bytes: bytes = b""
 
 
 @app.get("/api/v1/health", response_model=HealthResponse, tags=["General"])
 async def health_check():
     """Health check endpoint with detailed state information"""
-    return HealthResponse(
-        status="healthy",
-        current_model=pipeline_manager.current_model,
-        model_loaded=pipeline_manager.pipeline is not None,
-        is_loading=pipeline_manager.is_loading,
-        is_generating=pipeline_manager.is_generating,
-        queue_max_size=MAX_QUEUE_SIZE,
-        queue_cleanup_age_seconds=QUEUE_CLEANUP_AGE
-    )
+    global _health_cache_version, _health_cache_bytes
+
+    version = pipeline_manager.state_version
+    if version != _health_cache_version:
+        _health_cache_bytes = HealthResponse(
+            status="healthy",
+            current_model=pipeline_manager.current_model,
+            model_loaded=pipeline_manager.pipeline is not None,
+            is_loading=pipeline_manager.is_loading,
+            is_generating=pipeline_manager.is_generating,
+            queue_max_size=MAX_QUEUE_SIZE,
+            queue_cleanup_age_seconds=QUEUE_CLEANUP_AGE
+        ).model_dump_json().encode()
+        _health_cache_version = version
+
+    return Response(content=_health_cache_bytes, media_type="application/json")
 
 
 @app.post("/api/v1/load-model", tags=["Model Management"], dependencies=[Depends(verify_api_key)])
@@ -307,7 +681,6 @@ async def load_model(
     Returns:
         Status, model info, and timing information
     """
-    import time
     start = time.time()
     
     # Check if already busy
@@ -325,7 +698,7 @@ async def load_model(
     try:
         # Load the model with timeout
         pipeline = await asyncio.wait_for(
-            pipeline_manager.load_model(model),
+            _load_model_locked(model),
             timeout=MODEL_LOAD_TIMEOUT_SECONDS
         )
         
@@ -363,25 +736,14 @@ async def list_models():
     - CFG scale
     - Estimated generation time
     """
-    models = pipeline_manager.list_models()
-    return {
-        "models": {
-            key: ModelInfo(
-                name=config["name"],
-                suffix=config["suffix"],
-                steps=config["steps"],
-                cfg_scale=config["cfg_scale"],
-                estimated_time=config["estimated_time"],
-                description=config["description"]
-            )
-            for key, config in models.items()
-        },
-        "note": "Switching models between generations will take several minutes for model loading"
-    }
+    # The model catalog is static for the process lifetime, so the response
+    # is serialized once at import time
+    return Response(content=_MODELS_JSON, media_type="application/json")
 
 
 @app.post("/api/v1/submit", response_model=JobSubmitResponse, tags=["Job Queue"], dependencies=[Depends(verify_api_key)])
 async def submit_job(
+    response: Response,
     image: UploadFile = File(..., description="Input image (JPG, PNG)"),
     instruction: str = Form(..., description="Editing instruction"),
     preset: Optional[Literal["4-step", "8-step", "40-step"]] = Form(
@@ -429,31 +791,14 @@ async def submit_job(
         # Prompt content policy checks
         enforce_prompt_policy(instruction=instruction, system_prompt=system_prompt)
         
-        if image.content_type not in ["image/jpeg", "image/png", "image/jpg"]:
+        if image.content_type not in SUPPORTED_MIME:
             raise HTTPException(
                 status_code=400,
                 detail=f"Invalid image format: {image.content_type}. Must be JPEG or PNG"
             )
-        
-        image_data = await image.read()
-        image_size_mb = len(image_data) / (1024 * 1024)
-        
-        if image_size_mb > MAX_IMAGE_SIZE_MB:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Image too large ({image_size_mb:.1f}MB). Maximum {MAX_IMAGE_SIZE_MB}MB allowed."
-            )
-        
-        pil_image = Image.open(io.BytesIO(image_data)).convert("RGB")
-        width, height = pil_image.size
-        
-        if width > MAX_IMAGE_DIMENSION or height > MAX_IMAGE_DIMENSION:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Image dimensions too large ({width}x{height}). Maximum {MAX_IMAGE_DIMENSION}x{MAX_IMAGE_DIMENSION} pixels."
-            )
-        
-        # Check if model is loaded
+
+        # Check model state before touching the upload body, so rejected
+        # requests never materialize the image bytes
         if pipeline_manager.current_model is None:
             raise HTTPException(
                 status_code=400,
@@ -475,21 +820,38 @@ async def submit_job(
                     f"Call /api/v1/load-model?model={requested_model} first, then submit again."
                 )
             )
-        
+
+        # Decode straight from the spooled upload file so the raw bytes are
+        # never copied into a Python-owned buffer. Dimension limits are
+        # enforced inside the decode helper, before any pixels are decoded
+        _check_upload_size(image)
+        pil_image = await asyncio.to_thread(_decode_rgb_file, image.file)
+        pil_image = await asyncio.to_thread(_canonicalize, pil_image)
+
         # Submit job to queue
         try:
             job = await job_queue.submit_job(
                 instruction=instruction,
-                image_data=image_data,
+                # The decoded image is what the worker consumes; no need to
+                # keep the raw upload bytes alive on the job
+                image_data=b"",
                 model=pipeline_manager.current_model,
                 seed=seed,
-                system_prompt=system_prompt
+                system_prompt=system_prompt,
+                decoded_image=pil_image
             )
             
-            # Estimate wait time (rough estimate: position * avg_generation_time)
-            avg_time_per_job = 30  # seconds (approximate for 4-step model)
-            estimated_wait = (job.position - 1) * avg_time_per_job if job.position > 1 else 0
-            
+            # Estimate wait time from the measured per-model EWMA (falls
+            # back to 30s until the first generation completes)
+            avg_time_per_job = pipeline_manager.estimated_seconds_per_job(
+                pipeline_manager.current_model
+            )
+            estimated_wait = round((job.position - 1) * avg_time_per_job) if job.position > 1 else 0
+
+            # Hint for well-behaved pollers: how long until a status change
+            # is plausible for this job
+            response.headers["X-Poll-After"] = str(max(round(avg_time_per_job), 1))
+
             return JobSubmitResponse(
                 job_id=job.job_id,
                 status="queued",
@@ -511,32 +873,51 @@ async def submit_job(
 
 
 @app.get("/api/v1/status/{job_id}", response_model=JobStatusResponse, tags=["Job Queue"], dependencies=[Depends(verify_api_key)])
-async def get_job_status(job_id: str):
+async def get_job_status(
+    job_id: str,
+    if_none_match: Optional[str] = Header(default=None)
+):
     """
     Get the status of a submitted job
-    
+
     **Job States:**
     - `queued`: Waiting in queue (check `position`)
     - `processing`: Currently being generated
     - `completed`: Done! Check `result_path` and `result_seed`
     - `failed`: Error occurred (check `error` field)
-    
+
     **Polling Recommendation:**
     - Poll every 5-10 seconds while `status="queued"` or `"processing"`
     - Stop polling when `status="completed"` or `"failed"`
+    - Send back the `ETag` header as `If-None-Match` to get an empty 304
+      while nothing has changed
     """
     job = job_queue.get_job(job_id)
-    
+
     if not job:
         raise HTTPException(
             status_code=404,
             detail=f"Job {job_id} not found. It may have been cleaned up (jobs are kept for 1 hour after completion)."
         )
-    
-    return JobStatusResponse(
+
+    position = job_queue.get_position(job) if job.status == JobStatus.QUEUED else None
+
+    # ETag over everything the client can observe changing between polls;
+    # an unchanged job costs a bodyless 304 instead of a full serialization
+    etag = hashlib.blake2b(
+        f"{job.status.value}|{position}|{job.completed_at}".encode(),
+        digest_size=8
+    ).hexdigest()
+
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    # Serialize directly through pydantic-core; returning a Response keeps
+    # FastAPI from re-encoding the model a second time
+    body = JOB_STATUS_ADAPTER.dump_json(JobStatusResponse(
         job_id=job.job_id,
         status=job.status.value,
-        position=job.position if job.status == JobStatus.QUEUED else None,
+        position=position,
         created_at=job.created_at,
         started_at=job.started_at,
         completed_at=job.completed_at,
@@ -545,7 +926,8 @@ async def get_job_status(job_id: str):
         error=job.error,
         instruction=job.instruction,
         model=job.model
-    )
+    ))
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
 @app.get("/api/v1/status/{job_id}/result", tags=["Job Queue"], dependencies=[Depends(verify_api_key)])
@@ -564,8 +946,6 @@ async def get_job_result(job_id: str):
     - 404: Job not found or not completed yet
     - 500: Result file missing
     """
-    from fastapi.responses import FileResponse
-    
     job = job_queue.get_job(job_id)
     
     if not job:
@@ -586,17 +966,21 @@ async def get_job_result(job_id: str):
             detail=f"Job {job_id} is completed but result path is missing."
         )
     
-    result_file = Path(job.result_path)
-    if not result_file.exists():
+    # One stat serves both the existence check and FileResponse's metadata
+    # (content-length, last-modified), instead of stat-ing twice
+    try:
+        stat_result = os.stat(job.result_path)
+    except FileNotFoundError:
         raise HTTPException(
             status_code=500,
             detail=f"Result file not found at {job.result_path}"
         )
-    
+
     return FileResponse(
-        path=str(result_file),
+        path=job.result_path,
         media_type="image/png",
-        filename=result_file.name
+        filename=Path(job.result_path).name,
+        stat_result=stat_result
     )
 
 
@@ -683,32 +1067,12 @@ async def edit_image(
         enforce_prompt_policy(instruction=instruction, system_prompt=system_prompt)
         
         # Validate image format
-        if image.content_type not in ["image/jpeg", "image/png", "image/jpg"]:
+        if image.content_type not in SUPPORTED_MIME:
             raise HTTPException(
                 status_code=400,
                 detail=f"Invalid image format: {image.content_type}. Must be JPEG or PNG"
             )
         
-        # Read image data and validate size
-        image_data = await image.read()
-        image_size_mb = len(image_data) / (1024 * 1024)
-        
-        if image_size_mb > MAX_IMAGE_SIZE_MB:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Image too large ({image_size_mb:.1f}MB). Maximum {MAX_IMAGE_SIZE_MB}MB allowed."
-            )
-        
-        # Open and validate image dimensions
-        input_image = Image.open(io.BytesIO(image_data)).convert("RGB")
-        width, height = input_image.size
-        
-        if width > MAX_IMAGE_DIMENSION or height > MAX_IMAGE_DIMENSION:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Image dimensions too large ({width}x{height}). Maximum {MAX_IMAGE_DIMENSION}x{MAX_IMAGE_DIMENSION} pixels."
-            )
-        
         # STEP 2: Check if a model is loaded
         if pipeline_manager.current_model is None:
             raise HTTPException(
@@ -732,49 +1096,113 @@ async def edit_image(
                 )
             )
         
-        # STEP 3: Check if busy
+        # Size check first (a seek/tell on the spooled upload): oversize
+        # bodies get their 413 before anything hashes or decodes them
+        _check_upload_size(image)
+
+        # Deterministic replays: an identical upload with identical
+        # parameters and an explicit seed serves the previous output file
+        # without touching the GPU
+        cache_key = None
+        if seed is not None:
+            digest = await asyncio.to_thread(_hash_upload, image.file)
+            cache_key = b"|".join((
+                digest,
+                instruction.encode(),
+                pipeline_manager.current_model.encode(),
+                str(seed).encode(),
+                (system_prompt or "").encode()
+            ))
+            cached_path = _result_cache_get(cache_key)
+            if cached_path is not None and os.path.exists(cached_path):
+                if return_image:
+                    return FileResponse(
+                        path=cached_path,
+                        media_type="image/png",
+                        filename=Path(cached_path).name,
+                        headers={
+                            "X-Seed": str(seed),
+                            "X-Model": pipeline_manager.current_model,
+                            "X-Preset": pipeline_manager.current_model,
+                            "X-Saved-Path": cached_path,
+                            "X-Cache": "hit"
+                        }
+                    )
+                return JSONResponse(
+                    content={
+                        "success": True,
+                        "filepath": cached_path,
+                        "seed": seed,
+                        "model": pipeline_manager.current_model,
+                        "preset": pipeline_manager.current_model,
+                        "instruction": instruction,
+                        "cached": True
+                    }
+                )
+
+        # STEP 3: Check if busy. Model loading still fails fast; generation
+        # contention is absorbed by a short bounded wait on edit_sem below
+        # instead of an immediate 409
         if pipeline_manager.is_loading:
             raise HTTPException(
                 status_code=409,
                 detail="Model is currently being loaded. Please wait for loading to complete."
             )
-        if pipeline_manager.is_generating:
+
+        # STEP 4: Decode the upload, now that every cheap check has passed
+        # (its size was already verified above, before the cache hashing)
+
+        # Open and validate the image (decode off the event loop, reading
+        # straight from the upload's spooled temp file; dimension limits
+        # are enforced inside the helper before any pixels are decoded)
+        input_image = await asyncio.to_thread(_decode_rgb_file, image.file)
+        input_image = await asyncio.to_thread(_canonicalize, input_image)
+
+        # STEP 5: Generate edited image using currently loaded model with
+        # timeout. Wait briefly for a generation slot so bursts of near-
+        # simultaneous requests queue up instead of bouncing with 409s;
+        # only give up if the GPU stays busy past the wait window
+        try:
+            await asyncio.wait_for(edit_sem.acquire(), timeout=EDIT_WAIT_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
             raise HTTPException(
                 status_code=409,
                 detail="Another image is currently being generated. Please wait for it to complete."
             )
-        
-        # STEP 4: Generate edited image using currently loaded model with timeout
-        output_image, used_seed = await asyncio.wait_for(
-            pipeline_manager.generate_image(
-                image=input_image,
-                instruction=instruction,
-                model_key=pipeline_manager.current_model,
-                seed=seed,
-                system_prompt=system_prompt
-            ),
-            timeout=GENERATION_TIMEOUT_SECONDS
-        )
+        try:
+            output_image, used_seed = await asyncio.wait_for(
+                _generate_locked(
+                    image=input_image,
+                    instruction=instruction,
+                    model_key=pipeline_manager.current_model,
+                    seed=seed,
+                    system_prompt=system_prompt
+                ),
+                timeout=GENERATION_TIMEOUT_SECONDS
+            )
+        finally:
+            edit_sem.release()
         
         # Save image using currently loaded model
-        saved_path = save_image(output_image, pipeline_manager.current_model, used_seed)
-        
+        saved_path = await save_image(output_image, pipeline_manager.current_model, used_seed)
+
+        if cache_key is not None:
+            _result_cache_put(cache_key, saved_path)
+
         # Prepare response
         if return_image:
-            # Convert image to bytes
-            img_byte_arr = io.BytesIO()
-            output_image.save(img_byte_arr, format='PNG')
-            img_byte_arr.seek(0)
-            
-            return Response(
-                content=img_byte_arr.getvalue(),
+            # Reuse the PNG already encoded to disk by save_image instead of
+            # PIL-encoding a second time into an in-memory buffer (which would
+            # double peak memory for multi-megabyte outputs)
+            return FileResponse(
+                path=saved_path,
                 media_type="image/png",
+                filename=Path(saved_path).name,
                 headers={
                     "X-Seed": str(used_seed),
                     "X-Model": pipeline_manager.current_model,
                     "X-Preset": pipeline_manager.current_model,
-                    "X-Saved-Path": saved_path,
-                    "Content-Disposition": f'attachment; filename="{Path(saved_path).name}"'
+                    "X-Saved-Path": saved_path
                 }
             )
         else:
@@ -804,4 +1232,23 @@ async def edit_image(
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+
+    # uvloop (bundled with uvicorn[standard]) is a much faster event loop, but
+    # it does not exist on Windows - fall back to stock asyncio there
+    try:
+        import uvloop  # noqa: F401
+        loop_impl = "uvloop"
+    except ImportError:
+        loop_impl = "asyncio"
+
+    # Access logging is pure per-request CPU that competes with generation;
+    # polling clients make it especially noisy. Warnings and errors still land.
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        loop=loop_impl,
+        http="httptools",
+        access_log=False,
+        log_level="warning"
+    )
@@ -1,9 +1,23 @@
 """
 Pydantic models for API request/response validation
 """
-from pydantic import BaseModel, Field
-from typing import Literal, Optional
+from pydantic import BaseModel, Field, TypeAdapter
+from typing import Optional
 from datetime import datetime
+from enum import Enum
+
+
+class ModelChoice(str, Enum):
+    """Available model presets.
+
+    Subclasses str so enum members compare and hash like their plain
+    string values (MODEL_CONFIGS lookups, logging, etc. keep working),
+    while pydantic-core validates membership by dict lookup instead of
+    scanning Literal candidates.
+    """
+    FOUR_STEP = "4-step"
+    EIGHT_STEP = "8-step"
+    FORTY_STEP = "40-step"
 
 
 class ModelInfo(BaseModel):
@@ -19,8 +33,8 @@ class ModelInfo(BaseModel):
 class EditRequest(BaseModel):
     """Request body for image editing (when using JSON instead of form)"""
     instruction: str = Field(..., description="Editing instruction (e.g., 'Make this person into Superman')")
-    model: Literal["4-step", "8-step", "40-step"] = Field(
-        default="4-step",
+    model: ModelChoice = Field(
+        default=ModelChoice.FOUR_STEP,
         description="Model to use: 4-step (20s), 8-step (40s), or 40-step (3min)"
     )
     seed: Optional[int] = Field(
@@ -33,6 +47,16 @@ class EditRequest(BaseModel):
     )
 
 
+# Built once at import so per-request validation skips schema/validator
+# construction; validate_json parses raw bytes in a single pydantic-core pass
+EDIT_REQUEST_ADAPTER: TypeAdapter = TypeAdapter(EditRequest)
+
+
+def parse_edit_request(raw: bytes) -> EditRequest:
+    """Validate a raw JSON request body into an EditRequest."""
+    return EDIT_REQUEST_ADAPTER.validate_json(raw)
+
+
 class HealthResponse(BaseModel):
     """Health check response with operation state"""
     status: str
@@ -68,6 +92,12 @@ class JobStatusResponse(BaseModel):
     model: Optional[str] = None
 
 
+# Shared serializer for the hot /status polling path: dump_json runs one
+# pydantic-core pass (datetimes included) instead of FastAPI's
+# jsonable_encoder + re-validation round trip
+JOB_STATUS_ADAPTER: TypeAdapter = TypeAdapter(JobStatusResponse)
+
+
 class QueueStatusResponse(BaseModel):
     """Response for queue status query"""
     queue_size: int
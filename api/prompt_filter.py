@@ -6,6 +6,7 @@ ASCII word-boundary matching. Intended as a lightweight safety/UX guardrail.
 
 from __future__ import annotations
 
+import functools
 import re
 from dataclasses import dataclass
 from typing import Iterable, Optional, Sequence
@@ -25,20 +26,34 @@ DEFAULT_BLOCKED_PROMPT_TERMS: Sequence[str] = (
 class PromptFilterConfig:
     enabled: bool = True
     blocked_terms: Sequence[str] = DEFAULT_BLOCKED_PROMPT_TERMS
+    # Fields longer than this are rejected outright, bounding worst-case
+    # filter time regardless of input size (the API caps instructions far
+    # below this anyway)
+    max_scan_chars: int = 4096
 
 
-def _compile_blocked_term_patterns(blocked_terms: Iterable[str]) -> list[re.Pattern[str]]:
-    patterns: list[re.Pattern[str]] = []
-    for raw_term in blocked_terms:
-        term = (raw_term or "").strip().lower()
-        if not term:
-            continue
+@functools.lru_cache(maxsize=8)
+def _normalize_terms(blocked_terms: tuple[str, ...]) -> tuple[str, ...]:
+    """Deduplicate, lowercase, and sort the raw blocklist once per list."""
+    return tuple(sorted({t for t in ((raw or "").strip().lower() for raw in blocked_terms) if t}))
 
-        # ASCII-ish word boundary: letters/digits only are considered part of a word.
-        # This catches punctuation and hyphenation like "topless," or "top-less".
-        pattern = re.compile(rf"(?i)(?:^|[^a-z0-9]){re.escape(term)}(?:$|[^a-z0-9])")
-        patterns.append(pattern)
-    return patterns
+
+@functools.lru_cache(maxsize=8)
+def _compile_blocklist(terms: tuple[str, ...]) -> Optional[re.Pattern[str]]:
+    """Compile the whole (normalized) blocklist into one alternation pattern.
+
+    One compiled pattern means one linear scan of the text in the C regex
+    engine regardless of blocklist size, instead of recompiling and
+    rescanning per term. Lookaround boundaries don't consume characters,
+    so adjacent blocked terms are all reported. Cached per distinct
+    blocklist (there is normally exactly one per process).
+    """
+    if not terms:
+        return None
+    alternation = "|".join(re.escape(term) for term in terms)
+    # Same ASCII-ish word boundary as before: letters/digits only are
+    # considered part of a word.
+    return re.compile(rf"(?i)(?<![a-z0-9])(?:{alternation})(?![a-z0-9])")
 
 
 def find_blocked_terms(text: Optional[str], blocked_terms: Iterable[str]) -> list[str]:
@@ -49,15 +64,31 @@ def find_blocked_terms(text: Optional[str], blocked_terms: Iterable[str]) -> lis
     if not haystack:
         return []
 
-    matches: set[str] = set()
-    for raw_term in blocked_terms:
-        term = (raw_term or "").strip().lower()
-        if not term:
-            continue
-        if re.search(rf"(?i)(?:^|[^a-z0-9]){re.escape(term)}(?:$|[^a-z0-9])", haystack):
-            matches.add(term)
+    terms = _normalize_terms(tuple(blocked_terms))
+    if not terms:
+        return []
+
+    # Most prompts contain no blocked term at all. A plain substring scan
+    # (C-level fastsearch) is far cheaper than the regex automaton, so run
+    # the boundary-aware pattern only after a raw substring hit.
+    lowered = haystack.lower()
+    if not any(term in lowered for term in terms):
+        return []
+
+    pattern = _compile_blocklist(terms)
+    return sorted({match.group(0).lower() for match in pattern.finditer(haystack)})
+
+
+class PromptTooLongError(ValueError):
+    """Raised when a prompt field exceeds the filter's scan bound."""
 
-    return sorted(matches)
+    def __init__(self, field_name: str, length: int, limit: int):
+        self.field_name = field_name
+        self.length = length
+        self.limit = limit
+        super().__init__(
+            f"{field_name} too long ({length} chars). Maximum {limit} characters."
+        )
 
 
 def validate_prompt_fields(
@@ -65,10 +96,21 @@ def validate_prompt_fields(
     system_prompt: Optional[str],
     config: PromptFilterConfig,
 ) -> list[str]:
-    """Return list of blocked terms found across provided fields."""
+    """Return list of blocked terms found across provided fields.
+
+    Fields longer than ``config.max_scan_chars`` are rejected with
+    :class:`PromptTooLongError` rather than partially scanned - a safety
+    filter must never silently skip part of its input.
+    """
     if not config.enabled:
         return []
 
+    limit = config.max_scan_chars
+    if instruction and len(instruction) > limit:
+        raise PromptTooLongError("instruction", len(instruction), limit)
+    if system_prompt and len(system_prompt) > limit:
+        raise PromptTooLongError("system_prompt", len(system_prompt), limit)
+
     blocked_terms = config.blocked_terms or []
     found: set[str] = set()
 
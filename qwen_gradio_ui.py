@@ -1,7 +1,20 @@
 import os
+
+# Persist TorchInductor's compiled kernels across restarts (only matters
+# with QWEN_COMPILE_TRANSFORMER=1); must be set before torch is imported
+os.environ.setdefault(
+    "TORCHINDUCTOR_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "qwen-image-edit", "inductor"),
+)
+os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+
+import gc
 import torch
 import random
-import glob
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 from diffusers import QwenImageEditPlusPipeline
 from datetime import datetime
@@ -38,19 +51,48 @@ MODEL_CONFIGS = {
     }
 }
 
-# Cache for loaded pipelines
-pipelines_cache = {}
+# Keep attention on the fused SDPA kernels (flash / memory-efficient /
+# cuDNN where available) rather than risking the math fallback
+if torch.cuda.is_available():
+    torch.backends.cuda.enable_flash_sdp(True)
+    torch.backends.cuda.enable_mem_efficient_sdp(True)
+    if hasattr(torch.backends.cuda, "enable_cudnn_sdp"):
+        torch.backends.cuda.enable_cudnn_sdp(True)
+    # TF32 tensor cores for any fp32 residuals (the model runs bf16/int4)
+    torch.set_float32_matmul_precision("high")
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
+
+# Cache for loaded pipelines, LRU-bounded: three full pipelines at
+# ~12.7GB each would blow past 24GB VRAM and thrash the offloader, so
+# only the most recent model stays resident and older ones are dropped
+# (offload hooks make a clean .to("cpu") unreliable; reloading from the
+# OS page cache is the safer path back).
+pipelines_cache = OrderedDict()
+MAX_CACHED_PIPELINES = 1
 rank = 128
 
 def load_pipeline(model_choice, progress_callback=None):
     """
     Load or retrieve cached pipeline for the selected model
     """
-    if model_choice in pipelines_cache:
-        if progress_callback:
-            progress_callback(0.1, desc="Using cached model...")
-        return pipelines_cache[model_choice]
-    
+    # Hit path first and silent: no progress event for a dict lookup -
+    # emitting one here could land after the caller's own "Generating..."
+    # update and clobber it
+    pipeline = pipelines_cache.get(model_choice)
+    if pipeline is not None:
+        pipelines_cache.move_to_end(model_choice)
+        return pipeline
+
+    # Evict least-recently-used pipeline(s) before loading another
+    while len(pipelines_cache) >= MAX_CACHED_PIPELINES:
+        evicted_choice, evicted = pipelines_cache.popitem(last=False)
+        print(f"Releasing {evicted_choice} to free VRAM...")
+        del evicted
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
     config = MODEL_CONFIGS[model_choice]
     
     if progress_callback:
@@ -76,18 +118,47 @@ def load_pipeline(model_choice, progress_callback=None):
         torch_dtype=torch.bfloat16
     )
     print("✓ Pipeline loaded!")
-    
+
+    # channels_last keeps the VAE's convs on cuDNN's NHWC tensor-core path
+    pipeline.vae.to(memory_format=torch.channels_last)
+
     # Memory management
     gpu_memory = get_gpu_memory()
     print(f"✓ GPU Memory: {gpu_memory}GB")
     
     if gpu_memory > 18:
         pipeline.enable_model_cpu_offload()
+        # Opt-in compile: trims per-step Python dispatch, which is a real
+        # slice of the 4-step path, but the first compiled call is slow.
+        # Not offered on the sequential-offload branch - block-level
+        # offload hooks break graph capture.
+        if os.getenv("QWEN_COMPILE_TRANSFORMER", "0") == "1":
+            print("Compiling transformer (first generation will be slow)...")
+            pipeline.transformer = torch.compile(
+                pipeline.transformer,
+                mode=os.getenv("QWEN_COMPILE_MODE", "reduce-overhead"),
+                dynamic=False,
+            )
+            # Absorb the trace/compile cost now instead of on the user's
+            # first generation (a tiny 1-step pass is enough to trigger it)
+            print("Warming up compiled pipeline...")
+            try:
+                with torch.inference_mode():
+                    pipeline(
+                        image=[Image.new("RGB", (64, 64))],
+                        prompt="warmup",
+                        num_inference_steps=1,
+                        true_cfg_scale=1.0,
+                        generator=torch.Generator(device="cuda").manual_seed(0),
+                        num_images_per_prompt=1,
+                    )
+            except Exception as e:
+                print(f"Warmup failed (continuing): {e}")
     else:
         transformer.set_offload(True, use_pin_memory=False, num_blocks_on_gpu=1)
         pipeline._exclude_from_cpu_offload.append("transformer")
         pipeline.enable_sequential_cpu_offload()
-    
+
     pipeline.set_progress_bar_config(disable=None)
     
     # Cache the pipeline
@@ -108,58 +179,91 @@ def generate_random_seed():
     """
     return random.randint(0, 2**32 - 1)
 
+# Next-number cache: the directory is scanned once per prefix, then the
+# counter lives in memory (Gradio can run generations concurrently, hence
+# the lock). Nothing else writes to generated-images/ while the UI runs.
+_image_counters = {}
+_image_counter_lock = threading.Lock()
+
+# Compiled filename patterns, one per prefix (e.g. "qwen04_0001.png")
+_image_name_patterns = {}
+
+def _scan_image_number(model_prefix):
+    """
+    Scan generated-images/ for the highest existing number for this prefix
+    """
+    pat = _image_name_patterns.get(model_prefix)
+    if pat is None:
+        pat = re.compile(rf"{re.escape(model_prefix)}_(\d+)\.png$")
+        _image_name_patterns[model_prefix] = pat
+
+    # scandir streams entries without the glob machinery's list building,
+    # and the regex pulls the number out in one match
+    best = 0
+    try:
+        with os.scandir("generated-images") as entries:
+            for entry in entries:
+                m = pat.match(entry.name)
+                if m:
+                    number = int(m.group(1))
+                    if number > best:
+                        best = number
+    except FileNotFoundError:
+        pass
+
+    return best + 1
+
 def get_next_image_number(model_prefix):
     """
     Get the next sequential number for the given model prefix
-    Returns the next available number based on existing files
+    First call per prefix scans existing files; later calls just increment
     """
-    # Find all files matching the pattern
-    pattern = f"generated-images/{model_prefix}_*.png"
-    existing_files = glob.glob(pattern)
-    
-    if not existing_files:
-        return 1
-    
-    # Extract numbers from filenames
-    numbers = []
-    for filepath in existing_files:
-        filename = os.path.basename(filepath)
-        # Extract number from pattern like "qwen04_0001.png"
-        parts = filename.replace(".png", "").split("_")
-        if len(parts) >= 2:
-            try:
-                numbers.append(int(parts[-1]))
-            except ValueError:
-                continue
-    
-    # Return next number
-    return max(numbers) + 1 if numbers else 1
+    with _image_counter_lock:
+        number = _image_counters.get(model_prefix)
+        if number is None:
+            number = _scan_image_number(model_prefix)
+        _image_counters[model_prefix] = number + 1
+        return number
+
+# Smart quotes -> ASCII quotes, null bytes dropped; one table so
+# sanitize_text does a single C-level pass instead of five .replace()s
+_SANITIZE_TRANS = str.maketrans({
+    "“": '"', "”": '"',  # “ ”
+    "‘": "'", "’": "'",  # ‘ ’
+    "\x00": None,
+})
 
 def sanitize_text(text):
     """
     Remove or replace problematic characters that might cause issues
+    (smart quotes, null bytes, prompts wrapped entirely in quotes)
     """
     if not text:
         return text
-    
-    # Replace smart quotes with regular quotes
-    text = text.replace('"', '"').replace('"', '"')
-    text = text.replace(''', "'").replace(''', "'")
-    
-    # Remove null bytes
-    text = text.replace('\x00', '')
-    
-    # Strip whitespace first
-    text = text.strip()
-    
-    # Remove leading/trailing quotes that might cause issues
-    # This handles cases where users wrap entire prompt in quotes
-    while text and text[0] in ['"', "'"]:
-        text = text[1:]
-    while text and text[-1] in ['"', "'"]:
-        text = text[:-1]
-    
-    return text.strip()
+    return text.translate(_SANITIZE_TRANS).strip().strip("\"'").strip()
+
+# Background writer for saved PNGs; the displayed image comes straight
+# from memory, so disk encoding never blocks the handler
+_save_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="png-save")
+
+def _report_save_result(future, output_path):
+    """Surface background-save failures (disk full, permissions, ...)"""
+    error = future.exception()
+    if error is not None:
+        print(f"❌ Failed to save {output_path}: {error}")
+
+# Dedicated RNG for sampling noise. torch.manual_seed would mutate the
+# global CPU RNG (shared with Gradio worker threads) and force the
+# sampler to draw noise on CPU and copy it over; a device-local
+# generator is reseeded per call and draws directly on the GPU.
+_generator = torch.Generator(device="cuda" if torch.cuda.is_available() else "cpu")
+
+# Static prompt fragments, built once at import. Keeping these canonical
+# (byte-identical across calls) also helps any downstream text-encoder
+# caching since repeated prompts stay repeated.
+_FACE_PRESERVATION = "IMPORTANT: Keep the person's exact face, facial features, identity, likeness, and expression identical to the seed image. Maintain facial structure perfectly."
+_NEG_FACE_SUFFIX = ", changed face, different person, face swap, altered facial features, wrong identity"
+_DEFAULT_ENHANCED_NEG = "changed face, different person, face swap, altered facial features, wrong identity, blurry face, distorted face, deformed face"
 
 def generate_image(
     seed_image,
@@ -181,14 +285,20 @@ def generate_image(
         if seed_image is None:
             return None, "❌ Please upload a seed image!"
         
-        seed_img = Image.fromarray(seed_image).convert("RGB")
-        
+        # fromarray on an HxWx3 uint8 array already yields RGB, so the
+        # convert("RGB") copy is only needed for grayscale/alpha uploads
+        seed_img = Image.fromarray(seed_image)
+        if seed_img.mode != "RGB":
+            seed_img = seed_img.convert("RGB")
+
         # Prepare images list - add reference image if provided
         images_list = [seed_img]
         reference_note = ""
-        
+
         if reference_image is not None:
-            ref_img = Image.fromarray(reference_image).convert("RGB")
+            ref_img = Image.fromarray(reference_image)
+            if ref_img.mode != "RGB":
+                ref_img = ref_img.convert("RGB")
             images_list.append(ref_img)
             reference_note = " Using reference image for pose/style/background guidance."
         
@@ -199,23 +309,25 @@ def generate_image(
         
         # Craft the full prompt with STRONG face preservation
         # Face preservation comes FIRST for maximum emphasis
-        face_preservation = "IMPORTANT: Keep the person's exact face, facial features, identity, likeness, and expression identical to the seed image. Maintain facial structure perfectly."
-        
         if system_prompt and system_prompt.strip():
-            full_prompt = f"{face_preservation} {system_prompt.strip()} {instruction}"
+            full_prompt = f"{_FACE_PRESERVATION} {system_prompt.strip()} {instruction}"
         else:
-            full_prompt = f"{face_preservation} {instruction}"
-        
-        # Enhance negative prompt with face-specific terms
-        enhanced_negative = negative_prompt
-        if enhanced_negative:
-            enhanced_negative += ", changed face, different person, face swap, altered facial features, wrong identity"
-        else:
-            enhanced_negative = "changed face, different person, face swap, altered facial features, wrong identity, blurry face, distorted face, deformed face"
-        
+            full_prompt = f"{_FACE_PRESERVATION} {instruction}"
+
         # Load the selected model (cached after first load)
         pipeline = load_pipeline(model_choice, progress)
         config = MODEL_CONFIGS[model_choice]
+
+        # Enhance negative prompt with face-specific terms. At
+        # true_cfg_scale=1.0 (Lightning models) guidance contributes
+        # nothing, and passing a negative prompt can still trigger the
+        # second forward per step - omit it there
+        if config["true_cfg_scale"] <= 1.0:
+            enhanced_negative = None
+        elif negative_prompt:
+            enhanced_negative = negative_prompt + _NEG_FACE_SUFFIX
+        else:
+            enhanced_negative = _DEFAULT_ENHANCED_NEG
         
         progress(0.3, desc="Generating image...")
         
@@ -223,7 +335,7 @@ def generate_image(
         inputs = {
             "image": images_list,  # Can be single image or [seed, reference]
             "prompt": full_prompt,
-            "generator": torch.manual_seed(seed),
+            "generator": _generator.manual_seed(int(seed)),
             "true_cfg_scale": config["true_cfg_scale"],
             "negative_prompt": enhanced_negative,
             "num_inference_steps": config["steps"],
@@ -250,14 +362,17 @@ def generate_image(
         image_number = get_next_image_number(model_prefix)
         
         # Save with simple sequential naming: qwen04_0001.png, qwen08_0042.png, etc.
+        # Saved in the background at fast compression: PNG DEFLATE takes a
+        # few hundred ms at 1024x1024 and the UI doesn't need to wait on it
         output_path = f"generated-images/{model_prefix}_{image_number:04d}.png"
-        output_image.save(output_path)
+        future = _save_pool.submit(output_image.save, output_path, optimize=False, compress_level=1)
+        future.add_done_callback(lambda f, path=output_path: _report_save_result(f, path))
         
         progress(1.0, desc="Complete!")
         
         info = f"""✅ **Generation Complete!**{reference_note}
         
-📁 **Saved to:** `{output_path}`
+📁 **Saving to:** `{output_path}`
 🎨 **Model:** {model_choice}
 ⏱️ **Steps:** {config['steps']} | CFG Scale: {config['true_cfg_scale']}
 🎲 **Seed:** {seed} (save this to recreate exact result!)
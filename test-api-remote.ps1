@@ -756,10 +756,10 @@ try {
     New-TestImage -Width 3000 -Height 3000 -OutputPath $largeImagePath
     $result = Invoke-MultipartRequest -Endpoint "/submit" -ImagePath $largeImagePath -Instruction "Test"
     
-    if (-not $result.Success -and $result.StatusCode -eq 400) {
-        Pass-Test "Correctly rejected with 400"
+    if (-not $result.Success -and $result.StatusCode -eq 413) {
+        Pass-Test "Correctly rejected with 413"
     } else {
-        Fail-Test "Should have rejected oversized image"
+        Fail-Test "Should have rejected oversized image with 413"
     }
     Remove-Item $largeImagePath -ErrorAction SilentlyContinue
 } catch {
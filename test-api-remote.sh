@@ -692,10 +692,10 @@ response=$(invoke_multipart_request "/submit" "$large_image" "Test" "0")
 status=$(echo "$response" | cut -d'|' -f1)
 http_code=$(echo "$response" | cut -d'|' -f3)
 
-if [ "$status" = "error" ] && [ "$http_code" = "400" ]; then
-    pass_test "Correctly rejected with 400"
+if [ "$status" = "error" ] && [ "$http_code" = "413" ]; then
+    pass_test "Correctly rejected with 413"
 else
-    fail_test "Expected 400 rejection, got $http_code"
+    fail_test "Expected 413 rejection, got $http_code"
 fi
 
 # Test 14: Request Invalid Job ID